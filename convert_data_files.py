@@ -7,25 +7,136 @@ for use with the hybrid modeling pipeline.
 
 import sys
 import os
+import csv
+from datetime import datetime, time
+from itertools import count
+from operator import itemgetter
 from pathlib import Path
 import pandas as pd
 import numpy as np
+from io_utils import process_files
 
 try:
     import scipy.io
+    from mat_io import whosmat_any, load_mat_any
     SCIPY_AVAILABLE = True
 except ImportError:
     SCIPY_AVAILABLE = False
     print("⚠️  scipy not available - cannot convert .mat files")
 
-def convert_excel_to_csv(excel_path, output_dir="data"):
-    """Convert Excel file to CSV."""
+MIDNIGHT = time(0)
+
+# MATLAB classes (as reported by whosmat) that load as plain ndarrays
+MAT_ARRAY_CLASSES = {
+    'double', 'single', 'logical', 'char',
+    'int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64',
+}
+
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+def read_calamine_rows(excel_path):
+    """Read all rows of the first sheet with the Rust-backed calamine reader."""
+    rows = CalamineWorkbook.from_path(str(excel_path)).get_sheet_by_index(0).to_python(skip_empty_area=False)
+    # calamine reports every number as float - turn whole numbers back into int
+    # (as pandas' calamine engine does) so the CSV matches the other readers
+    return [[int(v) if isinstance(v, float) and v.is_integer() else v for v in row]
+            for row in rows]
+
+def read_excel_fast(excel_path):
+    """
+    Read the first sheet of an Excel file into a DataFrame.
+    
+    Uses calamine if installed, then openpyxl's streaming reader, then pd.read_excel.
+    """
+    if CALAMINE_AVAILABLE:
+        rows = read_calamine_rows(excel_path)
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows[1:], columns=rows[0])
+    
+    if not OPENPYXL_AVAILABLE:
+        return pd.read_excel(excel_path)
+    
+    # read_only mode parses rows lazily instead of building the full workbook DOM
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        return pd.DataFrame(rows, columns=header)
+    finally:
+        wb.close()
+
+def format_csv_row(row):
+    """Format datetime cells like DataFrame.to_csv: date only when the time is midnight."""
+    return [v.date() if isinstance(v, datetime) and v.time() == MIDNIGHT else v for v in row]
+
+def write_rows_to_csv(rows, csv_path):
+    """Write an iterable of row tuples to CSV; the first row is the header."""
+    rows = iter(rows)
+    header = next(rows, None) or ()
+    # Rows are counted as they stream past, so writerows stays one call
+    counter = count()
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(map(format_csv_row, map(itemgetter(0), zip(rows, counter))))
+    n_rows = next(counter)
+    return (n_rows, len(header)), list(header)
+
+def stream_xlsx_to_csv(xlsx_path, csv_path):
+    """
+    Copy the first sheet of an Excel file to CSV row by row.
+    
+    No DataFrame is built. calamine (if installed) parses the sheet natively;
+    otherwise openpyxl streams it, keeping memory use constant.
+    
+    Returns:
+    --------
+    shape : tuple
+        (n_rows, n_columns) written, excluding the header row
+    header : list
+        Header row of the sheet
+    """
+    if CALAMINE_AVAILABLE:
+        return write_rows_to_csv(read_calamine_rows(xlsx_path), csv_path)
+    
+    wb = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        return write_rows_to_csv(wb.worksheets[0].iter_rows(values_only=True), csv_path)
+    finally:
+        wb.close()
+
+def convert_excel_to_csv(excel_path, output_dir="data", inspect_dtypes=False):
+    """
+    Convert Excel file to CSV.
+    
+    Rows are streamed straight to disk by default; pass inspect_dtypes=True
+    to go through a pandas DataFrame instead (e.g. to check column types).
+    """
     try:
-        df = pd.read_excel(excel_path)
         output_path = Path(output_dir) / f"{excel_path.stem}.csv"
-        df.to_csv(output_path, index=False)
+        if (CALAMINE_AVAILABLE or OPENPYXL_AVAILABLE) and not inspect_dtypes:
+            shape, columns = stream_xlsx_to_csv(excel_path, output_path)
+        else:
+            df = read_excel_fast(excel_path)
+            df.to_csv(output_path, index=False)
+            shape, columns = df.shape, list(df.columns)
         print(f"  ✅ Converted {excel_path.name} to {output_path}")
-        print(f"     Shape: {df.shape}, Columns: {list(df.columns)[:5]}")
+        print(f"     Shape: {shape}, Columns: {columns[:5]}")
+        if inspect_dtypes:
+            print(f"     Dtypes: {dict(df.dtypes.astype(str))}")
         return output_path
     except Exception as e:
         print(f"  ❌ Error converting {excel_path.name}: {e}")
@@ -38,36 +149,45 @@ def convert_mat_to_csv(mat_path, output_dir="data"):
         return None
     
     try:
-        mat_data = scipy.io.loadmat(str(mat_path))
-        
-        # Find data arrays (skip metadata keys starting with __)
-        data_keys = [k for k in mat_data.keys() if not k.startswith('__')]
+        # Find plain data arrays from the file header; structs and cells
+        # can't be written as a flat CSV, so don't decode them at all
+        data_keys = []
+        for name, _, mat_class in whosmat_any(mat_path):
+            if mat_class in MAT_ARRAY_CLASSES:
+                data_keys.append(name)
+            else:
+                print(f"  ⚠️  Skipped {name} ({mat_class}) in {mat_path.name}")
         
         if not data_keys:
             print(f"  ⚠️  No data arrays found in {mat_path.name}")
             return None
         
+        mat_data = load_mat_any(mat_path, variable_names=data_keys)
+        
+        # Output files are named <output_dir>/<mat stem>_<variable>.csv
+        base_prefix = str(Path(output_dir) / mat_path.stem)
+        
         converted_files = []
         for key in data_keys:
             data = mat_data[key]
             
-            # Handle different data structures
-            if isinstance(data, np.ndarray):
-                if len(data.shape) == 2:
-                    # 2D array - save as CSV
-                    df = pd.DataFrame(data)
-                    output_path = Path(output_dir) / f"{mat_path.stem}_{key}.csv"
-                    df.to_csv(output_path, index=False, header=False)
-                    print(f"  ✅ Extracted {key} from {mat_path.name} to {output_path}")
-                    print(f"     Shape: {data.shape}")
-                    converted_files.append(output_path)
-                elif len(data.shape) == 1:
-                    # 1D array - save as single column
-                    df = pd.DataFrame(data, columns=[key])
-                    output_path = Path(output_dir) / f"{mat_path.stem}_{key}.csv"
-                    df.to_csv(output_path, index=False)
-                    print(f"  ✅ Extracted {key} from {mat_path.name} to {output_path}")
-                    converted_files.append(output_path)
+            # np.ndim works for any array-like (ndarray subclasses included)
+            ndim = np.ndim(data)
+            if ndim == 2:
+                # 2D array - save as CSV
+                df = pd.DataFrame(np.asarray(data))
+                output_path = Path(f"{base_prefix}_{key}.csv")
+                df.to_csv(output_path, index=False, header=False)
+                print(f"  ✅ Extracted {key} from {mat_path.name} to {output_path}")
+                print(f"     Shape: {np.shape(data)}")
+                converted_files.append(output_path)
+            elif ndim == 1:
+                # 1D array - save as single column
+                df = pd.DataFrame(np.asarray(data), columns=[key])
+                output_path = Path(f"{base_prefix}_{key}.csv")
+                df.to_csv(output_path, index=False)
+                print(f"  ✅ Extracted {key} from {mat_path.name} to {output_path}")
+                converted_files.append(output_path)
         
         return converted_files if converted_files else None
         
@@ -84,8 +204,15 @@ def find_and_convert_data_files(search_dir=".", output_dir="data"):
     print("Searching for data files...")
     print("=" * 60)
     
-    excel_files = list(search_path.rglob("*.xlsx"))
-    mat_files = list(search_path.rglob("*.mat"))
+    # Single directory walk, bucketing files by suffix
+    found = {'.xlsx': [], '.mat': []}
+    for dirpath, _, filenames in os.walk(search_path):
+        for filename in filenames:
+            suffix = os.path.splitext(filename)[1]
+            if suffix in found:
+                found[suffix].append(Path(dirpath) / filename)
+    excel_files = found['.xlsx']
+    mat_files = found['.mat']
     
     print(f"Found {len(excel_files)} Excel file(s)")
     print(f"Found {len(mat_files)} MATLAB file(s)")
@@ -96,11 +223,9 @@ def find_and_convert_data_files(search_dir=".", output_dir="data"):
     # Convert Excel files
     if excel_files:
         print("Converting Excel files:")
-        for excel_file in excel_files:
-            if 'bioreactor' in str(excel_file).lower() or 'data' in excel_file.name.lower():
-                result = convert_excel_to_csv(excel_file, output_dir)
-                if result:
-                    converted_count += 1
+        to_convert = [f for f in excel_files
+                      if 'bioreactor' in str(f).lower() or 'data' in f.name.lower()]
+        converted_count += len(process_files(convert_excel_to_csv, to_convert, output_dir))
         print()
     
     # Convert MATLAB files
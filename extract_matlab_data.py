@@ -8,14 +8,24 @@ This script extracts the time series (age, vcd, product, met) into CSV format.
 import sys
 import numpy as np
 from pathlib import Path
+from io_utils import write_columns_csv, process_files
 
 try:
     import scipy.io
+    from mat_io import whosmat_any, load_mat_any
     SCIPY_AVAILABLE = True
 except ImportError:
     print("❌ scipy not available - cannot read .mat files")
     sys.exit(1)
 
+# Standard column name -> candidate MATLAB field names, in CSV column order
+FIELD_MAP = [
+    ('time', ['age', 'time']),
+    ('biomass', ['vcd', 'biomass']),
+    ('product', ['product']),
+    ('substrate', ['met', 'substrate', 'glucose']),
+]
+
 def extract_batch_data(mat_file, output_dir="data"):
     """Extract time series data from batch MATLAB files."""
     output_dir = Path(output_dir)
@@ -24,57 +34,33 @@ def extract_batch_data(mat_file, output_dir="data"):
     print(f"\n📁 Processing: {Path(mat_file).name}")
     
     try:
-        mat_data = scipy.io.loadmat(mat_file, struct_as_record=False, squeeze_me=True)
-        
-        # Find the batch data structure
+        # Find the batch data structure from the file header
         batch_key = None
-        for key in mat_data.keys():
-            if not key.startswith('__') and 'batch' in key.lower():
-                batch_key = key
+        for name, _, _ in whosmat_any(mat_file):
+            if 'batch' in name.lower():
+                batch_key = name
                 break
         
         if not batch_key:
             print(f"   ⚠️  No batch data found")
             return None
         
+        # Decode only the batch variable
+        mat_data = load_mat_any(mat_file, variable_names=[batch_key],
+                                struct_as_record=False, squeeze_me=True)
         batch_data = mat_data[batch_key]
         
         # Extract time series data
         # The structure typically has: age (time), vcd (biomass), product, met (substrate/metabolite)
         extracted_data = {}
         
-        # Try to extract common fields
-        if hasattr(batch_data, 'age') or 'age' in dir(batch_data):
-            try:
-                age = batch_data.age if hasattr(batch_data, 'age') else getattr(batch_data, 'age', None)
-                if age is not None and hasattr(age, '__len__'):
-                    extracted_data['time'] = np.array(age).flatten()
-            except:
-                pass
-        
-        if hasattr(batch_data, 'vcd') or 'vcd' in dir(batch_data):
-            try:
-                vcd = batch_data.vcd if hasattr(batch_data, 'vcd') else getattr(batch_data, 'vcd', None)
-                if vcd is not None and hasattr(vcd, '__len__'):
-                    extracted_data['biomass'] = np.array(vcd).flatten()
-            except:
-                pass
-        
-        if hasattr(batch_data, 'product') or 'product' in dir(batch_data):
-            try:
-                product = batch_data.product if hasattr(batch_data, 'product') else getattr(batch_data, 'product', None)
-                if product is not None and hasattr(product, '__len__'):
-                    extracted_data['product'] = np.array(product).flatten()
-            except:
-                pass
-        
-        if hasattr(batch_data, 'met') or 'met' in dir(batch_data):
-            try:
-                met = batch_data.met if hasattr(batch_data, 'met') else getattr(batch_data, 'met', None)
-                if met is not None and hasattr(met, '__len__'):
-                    extracted_data['substrate'] = np.array(met).flatten()
-            except:
-                pass
+        # Try to extract common fields, first matching attribute wins
+        for std_name, candidates in FIELD_MAP:
+            for attr in candidates:
+                value = getattr(batch_data, attr, None)
+                if value is not None and hasattr(value, '__len__'):
+                    extracted_data[std_name] = np.asarray(value).ravel()
+                    break
         
         # If we got structured array, try different approach
         if not extracted_data and isinstance(batch_data, np.ndarray):
@@ -87,9 +73,9 @@ def extract_batch_data(mat_file, output_dir="data"):
                         if hasattr(field_data, '__len__') and len(field_data) > 0:
                             # Try to get first element if it's nested
                             if isinstance(field_data[0], np.ndarray):
-                                arr = field_data[0].flatten()
+                                arr = field_data[0].ravel()
                             else:
-                                arr = np.array(field_data).flatten()
+                                arr = np.asarray(field_data).ravel()
                             
                             # Map field names
                             if 'age' in field.lower() or 'time' in field.lower():
@@ -126,16 +112,8 @@ def extract_batch_data(mat_file, output_dir="data"):
         # Save as CSV
         output_file = output_dir / f"{Path(mat_file).stem}.csv"
         
-        # Create CSV content
-        with open(output_file, 'w') as f:
-            # Write header
-            headers = list(aligned_data.keys())
-            f.write(','.join(headers) + '\n')
-            
-            # Write data
-            for i in range(min_len):
-                row = [str(aligned_data[h][i]) for h in headers]
-                f.write(','.join(row) + '\n')
+        headers = list(aligned_data.keys())
+        write_columns_csv(output_file, aligned_data, dtype=None)
         
         print(f"   ✅ Extracted {min_len} time points")
         print(f"   ✅ Saved to: {output_file}")
@@ -169,11 +147,7 @@ def main():
     print("EXTRACTING TIME SERIES DATA FROM MATLAB FILES")
     print("=" * 60)
     
-    extracted_files = []
-    for mat_file in sorted(mat_files):
-        result = extract_batch_data(mat_file, output_dir)
-        if result:
-            extracted_files.append(result)
+    extracted_files = process_files(extract_batch_data, sorted(mat_files), output_dir)
     
     print("\n" + "=" * 60)
     print(f"✅ Extraction complete! {len(extracted_files)} file(s) extracted")
@@ -7,26 +7,35 @@ Handles nested MATLAB structures properly.
 import sys
 import numpy as np
 from pathlib import Path
+from io_utils import write_columns_csv, process_files
 
 try:
     import scipy.io
+    from scipy.io.matlab import mat_struct
+    from mat_io import whosmat_any, load_mat_any
     SCIPY_AVAILABLE = True
 except ImportError:
     print("❌ scipy not available")
     sys.exit(1)
 
+# dtype kinds treated as numeric leaves: float, int, uint
+_NUMERIC_KINDS = frozenset('fiu')
+
 def extract_nested_data(obj, max_depth=5, current_depth=0):
     """Recursively extract numeric arrays from nested MATLAB structures."""
     if current_depth > max_depth:
         return None
     
+    is_array = isinstance(obj, np.ndarray)
+    dtype = getattr(obj, 'dtype', None)
+    
     # If it's already a numpy array
-    if isinstance(obj, np.ndarray):
+    if is_array:
         # If it's a simple numeric array
-        if obj.dtype.kind in ['f', 'i', 'u']:  # float, int, uint
-            return obj.flatten()
+        if dtype.kind in _NUMERIC_KINDS:
+            return obj.ravel()
         # If it's object array, recurse
-        elif obj.dtype == object:
+        elif dtype == object:
             results = []
             for item in obj.flat:
                 extracted = extract_nested_data(item, max_depth, current_depth + 1)
@@ -35,38 +44,31 @@ def extract_nested_data(obj, max_depth=5, current_depth=0):
             if results:
                 # Try to combine if same length
                 try:
-                    return np.array(results).flatten()
+                    return np.asarray(results).ravel()
                 except:
                     return results[0] if results else None
     
-    # If it's a MATLAB struct
-    if hasattr(obj, '_fieldnames') or (hasattr(obj, 'dtype') and obj.dtype.names):
-        # Try to access as structured array
-        if hasattr(obj, 'dtype') and obj.dtype.names:
-            results = {}
-            for field in obj.dtype.names:
-                try:
-                    field_data = obj[field] if isinstance(obj, np.ndarray) else getattr(obj, field, None)
-                    if field_data is not None:
-                        extracted = extract_nested_data(field_data, max_depth, current_depth + 1)
-                        if extracted is not None:
-                            results[field] = extracted
-                except:
-                    continue
-            return results if results else None
-    
-    # Try as scipy mat_struct
-    if 'mat_struct' in str(type(obj)):
+    # If it's a MATLAB struct loaded as a structured array
+    if dtype is not None and dtype.names:
         results = {}
-        for attr in dir(obj):
-            if not attr.startswith('_'):
-                try:
-                    field_data = getattr(obj, attr)
+        for field in dtype.names:
+            try:
+                field_data = obj[field] if is_array else getattr(obj, field, None)
+                if field_data is not None:
                     extracted = extract_nested_data(field_data, max_depth, current_depth + 1)
                     if extracted is not None:
-                        results[attr] = extracted
-                except:
-                    continue
+                        results[field] = extracted
+            except:
+                continue
+        return results if results else None
+    
+    # Try as scipy mat_struct - only walk the MATLAB fields, not every attribute
+    if isinstance(obj, mat_struct):
+        results = {}
+        for attr in obj._fieldnames:
+            extracted = extract_nested_data(getattr(obj, attr), max_depth, current_depth + 1)
+            if extracted is not None:
+                results[attr] = extracted
         return results if results else None
     
     return None
@@ -79,20 +81,20 @@ def extract_batch_data_v2(mat_file, output_dir="data"):
     print(f"\n📁 Processing: {Path(mat_file).name}")
     
     try:
-        # Load with different options
-        mat_data = scipy.io.loadmat(str(mat_file), struct_as_record=False, squeeze_me=True)
-        
-        # Find batch key
+        # Find batch key from the file header
         batch_key = None
-        for key in mat_data.keys():
-            if not key.startswith('__') and 'batch' in key.lower():
-                batch_key = key
+        for name, _, _ in whosmat_any(mat_file):
+            if 'batch' in name.lower():
+                batch_key = name
                 break
         
         if not batch_key:
             print(f"   ⚠️  No batch data found")
             return None
         
+        # Load only the batch variable, with different options
+        mat_data = load_mat_any(mat_file, variable_names=[batch_key],
+                                struct_as_record=False, squeeze_me=True)
         batch_data = mat_data[batch_key]
         
         # Extract nested data
@@ -112,7 +114,7 @@ def extract_batch_data_v2(mat_file, output_dir="data"):
                 if key in extracted:
                     arr = extracted[key]
                     if isinstance(arr, np.ndarray) and len(arr) > 0:
-                        data_dict['time'] = arr.flatten()
+                        data_dict['time'] = arr.ravel()
                         break
             
             # Biomass (VCD)
@@ -120,7 +122,7 @@ def extract_batch_data_v2(mat_file, output_dir="data"):
                 if key in extracted:
                     arr = extracted[key]
                     if isinstance(arr, np.ndarray) and len(arr) > 0:
-                        data_dict['biomass'] = arr.flatten()
+                        data_dict['biomass'] = arr.ravel()
                         break
             
             # Product
@@ -128,7 +130,7 @@ def extract_batch_data_v2(mat_file, output_dir="data"):
                 if key in extracted:
                     arr = extracted[key]
                     if isinstance(arr, np.ndarray) and len(arr) > 0:
-                        data_dict['product'] = arr.flatten()
+                        data_dict['product'] = arr.ravel()
                         break
             
             # Substrate/Metabolite
@@ -136,7 +138,7 @@ def extract_batch_data_v2(mat_file, output_dir="data"):
                 if key in extracted:
                     arr = extracted[key]
                     if isinstance(arr, np.ndarray) and len(arr) > 0:
-                        data_dict['substrate'] = arr.flatten()
+                        data_dict['substrate'] = arr.ravel()
                         break
             
             if not data_dict:
@@ -158,13 +160,8 @@ def extract_batch_data_v2(mat_file, output_dir="data"):
             # Save to CSV
             output_file = output_dir / f"{Path(mat_file).stem}.csv"
             
-            with open(output_file, 'w') as f:
-                headers = list(aligned_data.keys())
-                f.write(','.join(headers) + '\n')
-                
-                for i in range(min_len):
-                    row = [str(float(aligned_data[h][i])) for h in headers]
-                    f.write(','.join(row) + '\n')
+            headers = list(aligned_data.keys())
+            write_columns_csv(output_file, aligned_data)
             
             print(f"   ✅ Extracted {min_len} time points")
             print(f"   ✅ Saved to: {output_file}")
@@ -194,11 +191,7 @@ def main():
     print("EXTRACTING TIME SERIES DATA FROM MATLAB FILES (v2)")
     print("=" * 60)
     
-    extracted_files = []
-    for mat_file in sorted(mat_files):
-        result = extract_batch_data_v2(mat_file, output_dir)
-        if result:
-            extracted_files.append(result)
+    extracted_files = process_files(extract_batch_data_v2, sorted(mat_files), output_dir)
     
     print("\n" + "=" * 60)
     print(f"✅ Extraction complete! {len(extracted_files)} file(s) extracted")
@@ -7,13 +7,23 @@ Based on understanding the structure from ReadBatchData.m
 import sys
 import numpy as np
 from pathlib import Path
+from io_utils import write_columns_csv, process_files
 
 try:
     import scipy.io
+    from mat_io import whosmat_any, load_mat_any
 except ImportError:
     print("❌ scipy not available")
     sys.exit(1)
 
+# (standard column name, MATLAB field name), in CSV column order
+BATCH_FIELDS = [
+    ('time', 'age'),
+    ('biomass', 'vcd'),
+    ('substrate', 'met'),
+    ('product', 'product'),
+]
+
 def extract_batch_final(mat_file, output_dir="data"):
     """Extract time series data from batch MATLAB files."""
     output_dir = Path(output_dir)
@@ -22,91 +32,55 @@ def extract_batch_final(mat_file, output_dir="data"):
     print(f"\n📁 Processing: {Path(mat_file).name}")
     
     try:
-        # Load with struct_as_record=True to preserve structure
-        mat_data = scipy.io.loadmat(str(mat_file), struct_as_record=True, squeeze_me=False)
-        
-        # Get batch data
-        batch_key = [k for k in mat_data.keys() if not k.startswith('__') and 'batch' in k.lower()]
+        # Find the batch variable from the file header without decoding anything
+        batch_key = [name for name, _, _ in whosmat_any(mat_file) if 'batch' in name.lower()]
         if not batch_key:
             print(f"   ⚠️  No batch data found")
             return None
         
+        # Load only the batch variable, with struct_as_record=True to preserve structure
+        mat_data = load_mat_any(mat_file, variable_names=batch_key[:1],
+                                struct_as_record=True, squeeze_me=False)
         batch = mat_data[batch_key[0]][0, 0]
         
-        # Extract time (age)
-        if 'age' in batch.dtype.names:
-            time_data = batch['age']
-            if time_data.shape[0] > 0:
-                time = time_data.flatten()
-            else:
-                print(f"   ⚠️  Empty time data")
-                return None
-        else:
+        names = set(batch.dtype.names)
+        
+        # Time (age) is required
+        if 'age' not in names:
             print(f"   ⚠️  No 'age' field found")
             return None
+        if batch['age'].shape[0] == 0:
+            print(f"   ⚠️  Empty time data")
+            return None
         
-        # Extract VCD (biomass)
-        biomass = None
-        if 'vcd' in batch.dtype.names:
-            vcd_data = batch['vcd']
-            # vcd might be nested - try to extract
-            if vcd_data.shape == (1, 1) and vcd_data.dtype == object:
-                # Nested structure
-                try:
-                    vcd_inner = vcd_data[0, 0]
-                    if isinstance(vcd_inner, np.ndarray):
-                        biomass = vcd_inner.flatten()
-                except:
-                    pass
-            elif len(vcd_data.shape) == 2:
-                biomass = vcd_data.flatten()
-        
-        # Extract product
-        product = None
-        if 'product' in batch.dtype.names:
-            prod_data = batch['product']
-            if prod_data.shape == (1, 1) and prod_data.dtype == object:
-                try:
-                    prod_inner = prod_data[0, 0]
-                    if isinstance(prod_inner, np.ndarray):
-                        product = prod_inner.flatten()
-                except:
-                    pass
-            elif len(prod_data.shape) == 2:
-                product = prod_data.flatten()
-        
-        # Extract metabolite/substrate (met)
-        substrate = None
-        if 'met' in batch.dtype.names:
-            met_data = batch['met']
-            # met might be a matrix (multiple metabolites) or nested
-            if met_data.shape == (1, 1) and met_data.dtype == object:
-                try:
-                    met_inner = met_data[0, 0]
-                    if isinstance(met_inner, np.ndarray):
-                        # If it's 2D, take first column (glucose typically)
-                        if len(met_inner.shape) == 2:
-                            substrate = met_inner[:, 0].flatten()
-                        else:
-                            substrate = met_inner.flatten()
-                except:
-                    pass
-            elif len(met_data.shape) == 2:
-                # If 2D, take first column
-                if met_data.shape[1] > 0:
-                    substrate = met_data[:, 0].flatten()
-                else:
-                    substrate = met_data.flatten()
-        
-        # Build data dictionary
-        data_dict = {'time': time}
-        
-        if biomass is not None and len(biomass) > 0:
-            data_dict['biomass'] = biomass
-        if substrate is not None and len(substrate) > 0:
-            data_dict['substrate'] = substrate
-        if product is not None and len(product) > 0:
-            data_dict['product'] = product
+        # Extract each field in a single pass over the mapping
+        data_dict = {}
+        for std_name, mat_name in BATCH_FIELDS:
+            if mat_name not in names:
+                continue
+            arr = batch[mat_name]
+            if arr.dtype != object:
+                # Fast path: plain numeric (N, k) matrix, nothing to unwrap
+                if arr.ndim != 2 and std_name != 'time':
+                    continue
+            elif arr.shape == (1, 1):
+                # Nested field - unwrap the object cell
+                arr = arr[0, 0]
+                if not isinstance(arr, np.ndarray):
+                    continue
+            elif arr.ndim != 2 and std_name != 'time':
+                continue
+            # met might be a matrix (multiple metabolites) - take first column (glucose typically)
+            if mat_name == 'met' and arr.ndim == 2 and arr.shape[1] > 0:
+                arr = arr[:, 0]
+            arr = arr.ravel()
+            if len(arr) > 0:
+                data_dict[std_name] = arr
+        
+        if 'time' not in data_dict:
+            print(f"   ⚠️  Could not extract time data")
+            return None
+        time = data_dict['time']
         
         # Align to same length
         lengths = [len(v) for v in data_dict.values()]
@@ -119,13 +93,8 @@ def extract_batch_final(mat_file, output_dir="data"):
         # Save to CSV
         output_file = output_dir / f"{Path(mat_file).stem}.csv"
         
-        with open(output_file, 'w') as f:
-            headers = list(aligned_data.keys())
-            f.write(','.join(headers) + '\n')
-            
-            for i in range(min_len):
-                row = [str(float(aligned_data[h][i])) for h in headers]
-                f.write(','.join(row) + '\n')
+        headers = list(aligned_data.keys())
+        write_columns_csv(output_file, aligned_data)
         
         print(f"   ✅ Extracted {min_len} time points")
         print(f"   ✅ Saved to: {output_file}")
@@ -140,6 +109,11 @@ def extract_batch_final(mat_file, output_dir="data"):
         traceback.print_exc()
         return None
 
+def count_lines(path, chunk_size=1 << 20):
+    """Count newlines in a file by scanning raw bytes in large chunks."""
+    with open(path, 'rb') as f:
+        return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(chunk_size), b''))
+
 def main():
     """Main function."""
     repo_dir = Path("temp_repos/Hybrid-modeling-of-bioreactor-with-LSTM/data")
@@ -161,11 +135,7 @@ def main():
     print("EXTRACTING BIOPROCESS DATA FROM MATLAB FILES")
     print("=" * 60)
     
-    extracted_files = []
-    for mat_file in mat_files:
-        result = extract_batch_final(mat_file, output_dir)
-        if result:
-            extracted_files.append(result)
+    extracted_files = process_files(extract_batch_final, mat_files, output_dir)
     
     print("\n" + "=" * 60)
     if extracted_files:
@@ -173,7 +143,7 @@ def main():
         print("\nExtracted files:")
         for f in extracted_files:
             size = f.stat().st_size / 1024
-            lines = sum(1 for _ in open(f))
+            lines = count_lines(f)
             print(f"  - {f.name} ({size:.1f} KB, {lines-1} time points)")
         
         print("\n📋 Next steps:")
@@ -5,15 +5,34 @@ Handles the nested structure: vcd[0,0]['val'] contains the actual data
 """
 
 import sys
+from itertools import islice
 import numpy as np
 from pathlib import Path
+from io_utils import write_columns_csv, process_files
 
 try:
     import scipy.io
+    from mat_io import whosmat_any, load_mat_any
 except ImportError:
     print("❌ scipy not available")
     sys.exit(1)
 
+def extract_val_column(batch, field, column):
+    """
+    Pull one time series out of a nested batch field: batch[field][0, 0]['val'][:, column].
+    
+    Returns None if the field or its 'val' entry is missing.
+    """
+    if field not in batch.dtype.names:
+        return None
+    field_struct = batch[field][0, 0]
+    if 'val' not in field_struct.dtype.names:
+        return None
+    val = field_struct['val']
+    if len(val.shape) == 2:
+        return val[:, column].ravel()
+    return val.ravel()
+
 def extract_batch_working(mat_file, output_dir="data", batch_column=0):
     """
     Extract time series data from batch MATLAB files.
@@ -22,6 +41,11 @@ def extract_batch_working(mat_file, output_dir="data", batch_column=0):
     -----------
     batch_column : int
         Which column to extract from multi-batch data (0 = first batch)
+    
+    Returns:
+    --------
+    result : tuple or None
+        (output_file, n_rows) on success, None otherwise
     """
     output_dir = Path(output_dir)
     output_dir.mkdir(exist_ok=True)
@@ -29,51 +53,30 @@ def extract_batch_working(mat_file, output_dir="data", batch_column=0):
     print(f"\n📁 Processing: {Path(mat_file).name}")
     
     try:
-        mat_data = scipy.io.loadmat(str(mat_file), struct_as_record=True, squeeze_me=False)
-        
-        batch_key = [k for k in mat_data.keys() if not k.startswith('__') and 'batch' in k.lower()]
+        # Find the batch variable from the file header without decoding anything
+        batch_key = [name for name, _, _ in whosmat_any(mat_file) if 'batch' in name.lower()]
         if not batch_key:
             return None
         
+        # Decode only the batch variable; v7.3 (HDF5) files are read through h5py
+        mat_data = load_mat_any(mat_file, variable_names=batch_key[:1],
+                                struct_as_record=True, squeeze_me=False)
         batch = mat_data[batch_key[0]][0, 0]
         
         # Extract time (age) - this is straightforward
-        time = batch['age'].flatten()
-        
-        # Extract VCD (biomass) - nested structure
-        biomass = None
-        if 'vcd' in batch.dtype.names:
-            vcd_struct = batch['vcd'][0, 0]
-            if 'val' in vcd_struct.dtype.names:
-                vcd_data = vcd_struct['val']
-                # vcd_data is (time_points, batches) - extract one batch
-                if len(vcd_data.shape) == 2:
-                    biomass = vcd_data[:, batch_column].flatten()
-                else:
-                    biomass = vcd_data.flatten()
+        time = batch['age'].ravel()
         
-        # Extract product - similar structure
-        product = None
-        if 'product' in batch.dtype.names:
-            prod_struct = batch['product'][0, 0]
-            if 'val' in prod_struct.dtype.names:
-                prod_data = prod_struct['val']
-                if len(prod_data.shape) == 2:
-                    product = prod_data[:, batch_column].flatten()
-                else:
-                    product = prod_data.flatten()
+        # vcd/product 'val' are (time_points, batches) - extract one batch;
+        # met 'val' is (time_points, metabolites) - take first metabolite (glucose)
+        biomass = extract_val_column(batch, 'vcd', batch_column)
+        product = extract_val_column(batch, 'product', batch_column)
+        substrate = extract_val_column(batch, 'met', 0)
         
-        # Extract metabolite/substrate (met) - similar structure
-        substrate = None
-        if 'met' in batch.dtype.names:
-            met_struct = batch['met'][0, 0]
-            if 'val' in met_struct.dtype.names:
-                met_data = met_struct['val']
-                # met_data might be (time_points, metabolites) - take first metabolite (glucose)
-                if len(met_data.shape) == 2:
-                    substrate = met_data[:, 0].flatten()  # First metabolite column
-                else:
-                    substrate = met_data.flatten()
+        # Only the extracted columns are needed from here on. They are views into the
+        # full (time_points, batches) matrices, so copy them out before releasing those
+        time, biomass, product, substrate = [
+            None if col is None else np.array(col) for col in (time, biomass, product, substrate)]
+        del mat_data, batch
         
         # Build data dictionary
         data_dict = {'time': time}
@@ -92,13 +95,8 @@ def extract_batch_working(mat_file, output_dir="data", batch_column=0):
         # Save to CSV
         output_file = output_dir / f"{Path(mat_file).stem}.csv"
         
-        with open(output_file, 'w') as f:
-            headers = list(data_dict.keys())
-            f.write(','.join(headers) + '\n')
-            
-            for i in range(len(time)):
-                row = [str(float(data_dict[h][i])) for h in headers]
-                f.write(','.join(row) + '\n')
+        headers = list(data_dict.keys())
+        write_columns_csv(output_file, data_dict)
         
         print(f"   ✅ Extracted {len(time)} time points")
         print(f"   ✅ Saved to: {output_file}")
@@ -109,7 +107,7 @@ def extract_batch_working(mat_file, output_dir="data", batch_column=0):
         if 'substrate' in headers:
             print(f"   Substrate range: {substrate.min():.2f} - {substrate.max():.2f}")
         
-        return output_file
+        return output_file, len(time)
         
     except Exception as e:
         print(f"   ❌ Error: {e}")
@@ -138,28 +136,20 @@ def main():
     print("EXTRACTING BIOPROCESS DATA FROM MATLAB FILES")
     print("=" * 60)
     
-    extracted_files = []
-    for mat_file in mat_files:
-        result = extract_batch_working(mat_file, output_dir, batch_column=0)
-        if result:
-            extracted_files.append(result)
+    extracted_files = process_files(extract_batch_working, mat_files, output_dir, 0)
     
     print("\n" + "=" * 60)
     if extracted_files:
         print(f"✅ Successfully extracted {len(extracted_files)} batch file(s)")
         print("\nExtracted files:")
-        for f in extracted_files:
+        for f, n_rows in extracted_files:
             size = f.stat().st_size / 1024
-            lines = sum(1 for _ in open(f))
-            print(f"  - {f.name} ({size:.1f} KB, {lines-1} time points)")
+            print(f"  - {f.name} ({size:.1f} KB, {n_rows} time points)")
         
         print("\n📋 Sample of first file:")
-        with open(extracted_files[0], 'r') as f:
-            for i, line in enumerate(f):
-                if i < 6:
-                    print(f"  {line.strip()}")
-                else:
-                    break
+        with open(extracted_files[0][0], 'r') as f:
+            for line in islice(f, 6):
+                print(f"  {line.strip()}")
         
         print("\n✅ Data ready for hybrid modeling!")
         print("\nNext steps:")
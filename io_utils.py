@@ -0,0 +1,54 @@
+"""
+Shared file helpers
+
+CSV writing and per-file parallel processing used by the extraction and
+conversion scripts.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+CSV_WRITE_BUFFER = 1 << 20  # bytes
+
+
+def write_columns_csv(path, columns, dtype=np.float64):
+    """
+    Write equal-length 1-D columns to a CSV file in one vectorized pass.
+    
+    Parameters:
+    -----------
+    path : str or Path
+        Output CSV file
+    columns : dict
+        Column name -> 1-D array, in CSV column order
+    dtype : numpy dtype or None
+        Columns are stacked into one contiguous block of this dtype;
+        None writes each column with its own dtype
+    """
+    if dtype is None:
+        frame = pd.DataFrame(columns)
+    else:
+        values = np.column_stack(list(columns.values())).astype(dtype, copy=False)
+        frame = pd.DataFrame(values, columns=list(columns))
+    with open(path, 'w', buffering=CSV_WRITE_BUFFER, newline='') as f:
+        frame.to_csv(f, index=False)
+
+
+def process_files(func, paths, *args):
+    """
+    Run func(path, *args) for every path in a process pool.
+    
+    Files are independent, so they are handled in parallel; results keep
+    input order and falsy (failed) results are dropped. The pool is sized to
+    the number of files, and zero or one file is processed in this process.
+    """
+    paths = list(paths)
+    arg_lists = [[arg] * len(paths) for arg in args]
+    if len(paths) <= 1:
+        return [result for result in map(func, paths, *arg_lists) if result]
+    
+    with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as executor:
+        results = executor.map(func, paths, *arg_lists)
+        return [result for result in results if result]
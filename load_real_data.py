@@ -5,9 +5,13 @@ This script loads real bioprocess data from files and prepares it for
 hybrid modeling analysis.
 """
 
+import os
+import json
+import fnmatch
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from io_utils import process_files
 from typing import List, Dict, Tuple, Optional
 import warnings
 warnings.filterwarnings('ignore')
@@ -32,6 +36,43 @@ ALTERNATIVE_NAMES = {
 }
 
 
+# Lower-cased alias -> (role, priority, alias); the primary name has priority 0
+_ALIAS_TO_ROLE = {}
+for _role, _names in ALTERNATIVE_NAMES.items():
+    for _rank, _name in enumerate([COLUMN_MAPPING[_role]] + _names):
+        _ALIAS_TO_ROLE.setdefault(_name.lower(), (_role, _rank, _name))
+
+
+def resolve_columns(df: pd.DataFrame) -> Dict[str, str]:
+    """
+    Match dataframe columns to roles using mapping and alternatives.
+    
+    Exact-case matches are preferred; a role falls back to case-insensitive
+    matching only when none of its names matches exactly. Among equally
+    good matches the primary name wins, then the earliest entry in
+    ALTERNATIVE_NAMES.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input dataframe
+    
+    Returns:
+    --------
+    columns : dict
+        Role (e.g., 'time', 'biomass') -> found column name
+    """
+    best = {}
+    for col in df.columns:
+        match = _ALIAS_TO_ROLE.get(str(col).lower())
+        if match is not None:
+            role, rank, alias = match
+            priority = (col != alias, rank)
+            if role not in best or priority < best[role][0]:
+                best[role] = (priority, col)
+    return {role: col for role, (_, col) in best.items()}
+
+
 def find_column(df: pd.DataFrame, target: str) -> Optional[str]:
     """
     Find column name in dataframe using mapping and alternatives.
@@ -48,16 +89,49 @@ def find_column(df: pd.DataFrame, target: str) -> Optional[str]:
     column_name : str or None
         Found column name or None
     """
-    # Try primary mapping
-    if COLUMN_MAPPING[target] in df.columns:
-        return COLUMN_MAPPING[target]
+    return resolve_columns(df).get(target)
+
+
+NUMERIC_COLUMNS = ['time', 'biomass', 'substrate', 'product']
+
+# Column order of the array returned by load_real_data_bundle
+BUNDLE_COLUMNS = ['time', 'biomass', 'substrate', 'product']
+
+
+def read_csv_columns(filepath: Path) -> pd.DataFrame:
+    """
+    Read only the mapped columns of a CSV file, parsing numbers in the C parser.
+    
+    Columns are resolved from the header line alone and renamed to their
+    primary COLUMN_MAPPING names. Falls back to a plain read if the header
+    lacks the required columns or a numeric column holds non-numeric text.
+    
+    Parameters:
+    -----------
+    filepath : Path
+        Path to CSV file
+    
+    Returns:
+    --------
+    df : pd.DataFrame
+        Loaded dataframe
+    """
+    header = pd.read_csv(filepath, nrows=0)
+    found = resolve_columns(header)
+    rename_map = {col: COLUMN_MAPPING[target] for target, col in found.items()}
     
-    # Try alternatives
-    for alt_name in ALTERNATIVE_NAMES.get(target, []):
-        if alt_name in df.columns:
-            return alt_name
+    if 'time' not in found or 'biomass' not in found:
+        return pd.read_csv(filepath)
     
-    return None
+    numeric_names = {COLUMN_MAPPING[t] for t in NUMERIC_COLUMNS}
+    numeric_dtypes = {col: np.float64 for col, name in rename_map.items() if name in numeric_names}
+    try:
+        df = pd.read_csv(filepath, usecols=list(rename_map), dtype=numeric_dtypes)
+    except ValueError:
+        # Non-numeric entries - let preprocess_data coerce them to NaN
+        df = pd.read_csv(filepath, usecols=list(rename_map))
+    
+    return df.rename(columns=rename_map)
 
 
 def load_data_from_file(filepath: str) -> pd.DataFrame:
@@ -77,7 +151,7 @@ def load_data_from_file(filepath: str) -> pd.DataFrame:
     filepath = Path(filepath)
     
     if filepath.suffix == '.csv':
-        df = pd.read_csv(filepath)
+        df = read_csv_columns(filepath)
     elif filepath.suffix in ['.xlsx', '.xls']:
         df = pd.read_excel(filepath)
     else:
@@ -106,13 +180,12 @@ def preprocess_data(df: pd.DataFrame,
     df_clean : pd.DataFrame
         Cleaned dataframe
     """
-    df = df.copy()
-    
     # Find required columns
-    time_col = find_column(df, 'time')
-    biomass_col = find_column(df, 'biomass')
-    substrate_col = find_column(df, 'substrate')
-    product_col = find_column(df, 'product')
+    found = resolve_columns(df)
+    time_col = found.get('time')
+    biomass_col = found.get('biomass')
+    substrate_col = found.get('substrate')
+    product_col = found.get('product')
     
     if not time_col or not biomass_col:
         raise ValueError("Required columns (time, biomass) not found!")
@@ -131,63 +204,110 @@ def preprocess_data(df: pd.DataFrame,
         new_names.append('product')
     
     # Keep experiment_id if present
-    exp_id_col = find_column(df, 'experiment_id')
+    exp_id_col = found.get('experiment_id')
     if exp_id_col:
         columns_to_keep.append(exp_id_col)
         new_names.append('experiment_id')
     
-    df = df[columns_to_keep].copy()
+    # Column selection already returns a new frame; the arrays below are the working copies
+    df = df[columns_to_keep]
     df.columns = new_names
     
     # Remove rows with missing required values
     df = df.dropna(subset=['time', 'biomass'])
     
-    # Fill missing product values with 0 if column exists
-    if 'product' in df.columns:
-        df['product'] = df['product'].fillna(0)
+    # Work on plain ndarrays from here on and rebuild the DataFrame once at the end
+    time = pd.to_numeric(df['time'], errors='coerce').to_numpy(dtype=np.float64)
+    columns = {col: pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, copy=True)
+               for col in ['biomass', 'substrate', 'product'] if col in df.columns}
+    experiment_id = df['experiment_id'].to_numpy() if 'experiment_id' in df.columns else None
+    
+    # Fill missing product values with 0 if column exists - only cells that were
+    # empty in the file; text that fails conversion stays NaN for the outlier mask
+    if 'product' in columns:
+        columns['product'][df['product'].isna().to_numpy()] = 0.0
     
     # If substrate is missing, estimate it from biomass growth
-    if 'substrate' not in df.columns:
+    if 'substrate' not in columns:
         print("  ⚠️  Substrate column not found - estimating from biomass growth")
         # Estimate substrate: start high, decrease with biomass growth
         initial_substrate = 10.0  # g/L (typical initial glucose)
         # Simple model: S = S0 - (X - X0) / Yxs
         Yxs_estimate = 0.5  # Estimated yield
-        X0 = df['biomass'].iloc[0]
-        df['substrate'] = initial_substrate - (df['biomass'] - X0) / Yxs_estimate
-        df['substrate'] = df['substrate'].clip(lower=0)  # Ensure non-negative
-    
-    # Ensure time is numeric
-    df['time'] = pd.to_numeric(df['time'], errors='coerce')
-    df = df.dropna(subset=['time'])
-    
-    # Ensure concentrations are numeric and non-negative
-    for col in ['biomass', 'substrate', 'product']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            if col == 'substrate':
-                # Substrate can be estimated, so handle NaN
-                df[col] = df[col].fillna(0)
-            df[col] = df[col].clip(lower=0)  # Ensure non-negative
-    
-    # Remove outliers if requested
+        biomass = columns['biomass']
+        # Single fused expression, clipped to non-negative
+        columns['substrate'] = np.maximum(initial_substrate - (biomass - biomass[0]) / Yxs_estimate, 0.0)
+        new_names.append('substrate')
+    else:
+        # Substrate can be estimated, so handle NaN
+        substrate = columns['substrate']
+        substrate[np.isnan(substrate)] = 0.0
+    
+    # Concentrations as one (n, k) block: non-negative, NaN kept for the outlier mask
+    num_cols = [col for col in ['biomass', 'substrate', 'product'] if col in columns]
+    values = np.column_stack([columns[col] for col in num_cols])
+    np.maximum(values, 0.0, out=values)  # Ensure non-negative
+    
+    # Drop rows with non-numeric time and, if requested, outliers - one combined mask
+    keep = ~np.isnan(time)
     if remove_outliers:
-        for col in ['biomass', 'substrate', 'product']:
-            if col in df.columns:
-                z_scores = np.abs((df[col] - df[col].mean()) / (df[col].std() + 1e-8))
-                df = df[z_scores < outlier_threshold]
+        kept = values[keep]
+        z_scores = np.abs((values - np.nanmean(kept, axis=0)) /
+                          (np.nanstd(kept, axis=0, ddof=1) + 1e-8))
+        keep &= (z_scores < outlier_threshold).all(axis=1)
     
-    # Sort by time
-    df = df.sort_values('time').reset_index(drop=True)
+    # Sort by time - one argsort, applied to every column
+    order = np.flatnonzero(keep)
+    order = order[np.argsort(time[order], kind='stable')]
     
-    return df
+    result = {'time': time[order]}
+    result.update((col, values[order, j]) for j, col in enumerate(num_cols))
+    if experiment_id is not None:
+        result['experiment_id'] = experiment_id[order]
+    
+    return pd.DataFrame(result, columns=new_names)
 
 
-def load_real_data(data_dir: str = "data",
-                  file_pattern: str = "*.csv",
-                  combine_experiments: bool = True) -> Tuple[np.ndarray, np.ndarray, Dict]:
+def load_preprocessed_file(filepath: Path) -> Tuple[np.ndarray, list]:
     """
-    Load and combine real bioprocess data from files.
+    Load and preprocess one data file for load_real_data_bundle.
+    
+    Parameters:
+    -----------
+    filepath : Path
+        Path to data file
+    
+    Returns:
+    --------
+    values : np.ndarray
+        Array of shape (n_samples, k) holding the first k BUNDLE_COLUMNS
+        (product is absent if the file has none)
+    experiment_ids : list
+        Experiment ID of each row
+    """
+    print(f"Loading: {filepath.name}")
+    df = load_data_from_file(filepath)
+    df = preprocess_data(df)
+    
+    # Extract data
+    if 'experiment_id' in df.columns:
+        exp_ids = df['experiment_id'].tolist()
+    else:
+        exp_ids = [filepath.stem] * len(df)
+    
+    # Check all required columns exist - data is [biomass, substrate, product]
+    missing_cols = [col for col in ['biomass', 'substrate'] if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns after preprocessing: {missing_cols}")
+    
+    cols = [col for col in BUNDLE_COLUMNS if col in df.columns]
+    return df[cols].to_numpy(dtype=np.float64), exp_ids
+
+
+def load_real_data_bundle(data_dir: str = "data",
+                         file_pattern: str = "*.csv") -> Tuple[np.ndarray, List[int], Dict]:
+    """
+    Load real bioprocess data from files into one columnar block.
     
     Parameters:
     -----------
@@ -195,90 +315,57 @@ def load_real_data(data_dir: str = "data",
         Directory containing data files
     file_pattern : str
         File pattern to match (e.g., "*.csv", "*.xlsx")
-    combine_experiments : bool
-        Whether to combine multiple experiments into one dataset
     
     Returns:
     --------
-    data : np.ndarray
-        Combined data array of shape (n_samples, n_features)
-        Features: [biomass, substrate, product]
-    time : np.ndarray
-        Time points
+    bundle : np.ndarray
+        Array of shape (n_samples, 4), columns in BUNDLE_COLUMNS order:
+        [time, biomass, substrate, product]
+    sizes : list of int
+        Number of rows contributed by each file, in bundle order
     metadata : dict
-        Metadata about the data (experiment IDs, file names, etc.)
+        Metadata about the data (experiment IDs, file names, column order, etc.)
     """
     data_dir = Path(data_dir)
     
-    # Find all data files
-    if '*' in file_pattern or '?' in file_pattern:
-        # Use glob pattern
-        files = list(data_dir.glob(file_pattern))
+    # Find all data files - a single scandir pass covers both glob patterns
+    # and exact file names; patterns reaching into subdirectories still use glob
+    if '/' in file_pattern or os.sep in file_pattern or not data_dir.is_dir():
+        files = sorted(data_dir.glob(file_pattern))
     else:
-        # Single file or exact match
-        if (data_dir / file_pattern).exists():
-            files = [data_dir / file_pattern]
-        else:
-            # Try as glob pattern anyway
-            files = list(data_dir.glob(file_pattern))
+        with os.scandir(data_dir) as entries:
+            names = sorted(entry.name for entry in entries
+                           if entry.is_file() and fnmatch.fnmatch(entry.name, file_pattern))
+        files = [data_dir / name for name in names]
     
     if not files:
         raise FileNotFoundError(f"No files found matching {file_pattern} in {data_dir}")
     
     print(f"Found {len(files)} data file(s)")
     
-    all_data = []
-    all_times = []
+    # Files are independent - load and preprocess them in parallel (results keep file order)
+    processed = process_files(load_preprocessed_file, files)
+    
+    # Copy every file straight into its slice of the block - missing product stays 0
+    sizes = [len(values) for values, _ in processed]
+    n_total = sum(sizes)
+    bundle = np.zeros((n_total, len(BUNDLE_COLUMNS)), dtype=np.float64)
     experiment_ids = []
     file_names = []
-    
-    for filepath in files:
-        print(f"Loading: {filepath.name}")
-        df = load_data_from_file(filepath)
-        df = preprocess_data(df)
-        
-        # Extract data
-        if 'experiment_id' in df.columns:
-            exp_ids = df['experiment_id'].values
-        else:
-            exp_ids = [filepath.stem] * len(df)
-        
-        # Create data array - ensure we have [biomass, substrate, product]
-        required_cols = ['biomass', 'substrate']
-        if 'product' in df.columns:
-            required_cols.append('product')
-        
-        # Check all required columns exist
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise ValueError(f"Missing required columns after preprocessing: {missing_cols}")
-        
-        data_array = df[required_cols].values
-        
-        # If product is missing, add zero column
-        if 'product' not in df.columns:
-            data_array = np.column_stack([
-                data_array,
-                np.zeros(len(df))
-            ])
-        
-        all_data.append(data_array)
-        all_times.append(df['time'].values)
+    offset = 0
+    for i, (filepath, n) in enumerate(zip(files, sizes)):
+        values, exp_ids = processed[i]
+        bundle[offset:offset + n, :values.shape[1]] = values
         experiment_ids.extend(exp_ids)
-        file_names.extend([filepath.name] * len(df))
-    
-    # Combine all experiments
-    if combine_experiments:
-        data = np.vstack(all_data)
-        time = np.hstack(all_times)
-    else:
-        # Keep separate (for per-experiment analysis)
-        data = all_data
-        time = all_times
+        file_names.extend([filepath.name] * n)
+        # Drop each file's array once copied (peak memory is still ~2x while the block fills)
+        processed[i] = values = None
+        offset += n
     
     metadata = {
         'n_experiments': len(files),
-        'n_samples': len(data) if combine_experiments else sum(len(d) for d in all_data),
+        'n_samples': n_total,
+        'columns': BUNDLE_COLUMNS,
         'experiment_ids': experiment_ids,
         'file_names': file_names,
         'files_loaded': [f.name for f in files]
@@ -288,11 +375,80 @@ def load_real_data(data_dir: str = "data",
     print(f"  Total samples: {metadata['n_samples']}")
     print(f"  Experiments: {metadata['n_experiments']}")
     print(f"  Features: [Biomass, Substrate, Product]")
+    
+    return bundle, sizes, metadata
+
+
+def load_real_data(data_dir: str = "data",
+                  file_pattern: str = "*.csv",
+                  combine_experiments: bool = True) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """
+    Load and combine real bioprocess data from files.
+    
+    Parameters:
+    -----------
+    data_dir : str
+        Directory containing data files
+    file_pattern : str
+        File pattern to match (e.g., "*.csv", "*.xlsx")
+    combine_experiments : bool
+        Whether to combine multiple experiments into one dataset
+    
+    Returns:
+    --------
+    data : np.ndarray
+        Combined data array of shape (n_samples, n_features)
+        Features: [biomass, substrate, product]
+    time : np.ndarray
+        Time points
+    metadata : dict
+        Metadata about the data (experiment IDs, file names, etc.)
+    """
+    bundle, sizes, metadata = load_real_data_bundle(data_dir, file_pattern)
+    
+    # Zero-copy views into the columnar block
+    time = bundle[:, 0]
+    data = bundle[:, 1:]
+    
+    if not combine_experiments:
+        # Keep separate (for per-experiment analysis)
+        bounds = np.cumsum(sizes)[:-1]
+        data = np.split(data, bounds)
+        time = np.split(time, bounds)
+    
     print(f"  Data shape: {data.shape if combine_experiments else [d.shape for d in data]}")
     
     return data, time, metadata
 
 
+def save_bundle(path, bundle: np.ndarray, metadata: Dict) -> None:
+    """
+    Save a data bundle and its metadata to a single compressed .npz archive.
+    
+    The [time, biomass, substrate, product] block is stored as float32 - ample
+    precision for hours and concentrations, and the model trains in float32.
+    Metadata (including column order) is stored as a JSON string.
+    """
+    np.savez_compressed(path,
+                        bundle=bundle.astype(np.float32, copy=False),
+                        metadata=np.array(json.dumps(metadata)))
+
+
+def load_saved_bundle(path) -> Tuple[np.ndarray, Dict]:
+    """
+    Load a bundle written by save_bundle.
+    
+    Returns:
+    --------
+    bundle : np.ndarray
+        Array of shape (n_samples, 4), columns in metadata['columns'] order
+    metadata : dict
+        Metadata saved alongside the data
+    """
+    with np.load(path) as archive:
+        return archive['bundle'], json.loads(str(archive['metadata']))
+
+
 if __name__ == "__main__":
     # Example usage
     import sys
@@ -302,7 +458,8 @@ if __name__ == "__main__":
         data_dir = sys.argv[1]
     
     try:
-        data, time, metadata = load_real_data(data_dir)
+        bundle, _, metadata = load_real_data_bundle(data_dir)
+        time, data = bundle[:, 0], bundle[:, 1:]
         print("\n✅ Data loaded successfully!")
         print(f"\nFirst 5 samples:")
         print(f"Time: {time[:5]}")
@@ -312,14 +469,9 @@ if __name__ == "__main__":
         output_dir = Path("inputs")
         output_dir.mkdir(exist_ok=True)
         
-        np.save(output_dir / "data.npy", data)
-        np.save(output_dir / "time.npy", time)
-        
-        import json
-        with open(output_dir / "metadata.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        save_bundle(output_dir / "bundle.npz", bundle, metadata)
         
-        print(f"\n✅ Preprocessed data saved to {output_dir}/")
+        print(f"\n✅ Preprocessed data saved to {output_dir / 'bundle.npz'}")
         
     except Exception as e:
         print(f"\n❌ Error loading data: {e}")
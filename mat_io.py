@@ -0,0 +1,113 @@
+"""
+Load MATLAB .mat files of any version
+
+MAT v4-v7 files are read with scipy.io. MAT v7.3 files are HDF5 containers,
+which scipy cannot read, so they are opened with h5py and converted to the
+same structures scipy.io.loadmat returns.
+"""
+
+import numpy as np
+import scipy.io
+from scipy.io.matlab import mat_struct
+
+try:
+    import h5py
+    H5PY_AVAILABLE = True
+except ImportError:
+    H5PY_AVAILABLE = False
+
+V73_SIGNATURE = b'MATLAB 7.3'
+
+
+def is_mat_v73(path):
+    """Check the 128-byte MAT header for the v7.3 (HDF5) signature."""
+    with open(path, 'rb') as f:
+        return f.read(128).startswith(V73_SIGNATURE)
+
+
+def _open_h5(path):
+    if not H5PY_AVAILABLE:
+        raise ImportError(f"{path} is a MATLAB v7.3 file - install h5py to read it")
+    return h5py.File(path, 'r')
+
+
+def _h5_variables(h5file):
+    """Top-level MATLAB variables (skips HDF5 bookkeeping groups like #refs#)."""
+    return [name for name in h5file.keys() if not name.startswith('#')]
+
+
+def _h5_to_python(node, struct_as_record, squeeze_me):
+    """Convert an HDF5 dataset/group to what scipy.io.loadmat would return."""
+    if isinstance(node, h5py.Dataset):
+        # MATLAB is column-major, so HDF5 stores arrays transposed
+        arr = np.asarray(node[()]).T
+        if arr.ndim < 2:
+            arr = np.atleast_2d(arr)
+        return np.squeeze(arr) if squeeze_me else arr
+
+    fields = list(node.keys())
+    values = [_h5_to_python(node[f], struct_as_record, squeeze_me) for f in fields]
+    if struct_as_record:
+        record = np.empty((1, 1), dtype=[(f, object) for f in fields])
+        for f, value in zip(fields, values):
+            record[f][0, 0] = value
+        return record[0, 0] if squeeze_me else record
+
+    struct = mat_struct()
+    struct._fieldnames = fields
+    for f, value in zip(fields, values):
+        setattr(struct, f, value)
+    return struct if squeeze_me else np.array([[struct]], dtype=object)
+
+
+def whosmat_any(path):
+    """
+    List the variables in a .mat file without loading them.
+
+    Returns:
+    --------
+    variables : list of (name, shape, class) tuples, as scipy.io.whosmat
+    """
+    path = str(path)
+    if not is_mat_v73(path):
+        return scipy.io.whosmat(path)
+
+    with _open_h5(path) as f:
+        variables = []
+        for name in _h5_variables(f):
+            node = f[name]
+            mat_class = node.attrs.get('MATLAB_class', b'struct')
+            if isinstance(mat_class, bytes):
+                mat_class = mat_class.decode()
+            shape = tuple(reversed(node.shape)) if isinstance(node, h5py.Dataset) else (1, 1)
+            variables.append((name, shape, mat_class))
+        return variables
+
+
+def load_mat_any(path, variable_names=None, struct_as_record=True, squeeze_me=False):
+    """
+    Load variables from a .mat file, dispatching on the file version.
+
+    Parameters:
+    -----------
+    path : str or Path
+        Path to the .mat file
+    variable_names : list of str, optional
+        Variables to load (all if None)
+    struct_as_record, squeeze_me : bool
+        Same meaning as for scipy.io.loadmat
+
+    Returns:
+    --------
+    mat_data : dict
+        Variable name -> loaded value
+    """
+    path = str(path)
+    if not is_mat_v73(path):
+        return scipy.io.loadmat(path, variable_names=variable_names,
+                                struct_as_record=struct_as_record, squeeze_me=squeeze_me)
+
+    with _open_h5(path) as f:
+        names = _h5_variables(f) if variable_names is None else variable_names
+        return {name: _h5_to_python(f[name], struct_as_record, squeeze_me)
+                for name in names if name in f}
@@ -10,9 +10,6 @@ import os
 from pathlib import Path
 import numpy as np
 import torch
-import matplotlib
-matplotlib.use('Agg')  # For batch jobs
-import matplotlib.pyplot as plt
 
 # Add parent directory to path to import pipeline modules
 sys.path.insert(0, str(Path(__file__).parent.parent / "hybrid_modeling_pipeline"))
@@ -23,14 +20,6 @@ from data_processing import (
     split_data
 )
 from training import Trainer
-from evaluation import (
-    evaluate_model,
-    plot_training_history,
-    plot_predictions,
-    plot_prediction_scatter,
-    plot_metrics_comparison,
-    print_evaluation_report
-)
 from load_real_data import load_real_data
 
 
@@ -208,6 +197,20 @@ def main():
     # STEP 5: Visualize Training History
     # ===================================================================
     print("STEP 5: Visualizing training history...")
+    
+    # Plotting is only needed once training is done - import it here so
+    # matplotlib isn't loaded during the compute-heavy steps
+    import matplotlib
+    matplotlib.use('Agg')  # For batch jobs
+    from evaluation import (
+        evaluate_model,
+        plot_training_history,
+        plot_predictions,
+        plot_prediction_scatter,
+        plot_metrics_comparison,
+        print_evaluation_report
+    )
+    
     plot_training_history(
         history,
         save_path=str(output_dir / "training_history.png")
@@ -0,0 +1,35 @@
+"""Tests for column resolution in load_real_data."""
+
+import unittest
+
+import pandas as pd
+
+from load_real_data import resolve_columns
+
+
+class ResolveColumnsTest(unittest.TestCase):
+
+    def resolve(self, header):
+        return resolve_columns(pd.DataFrame(columns=header))
+
+    def test_exact_alias_beats_case_insensitive_match(self):
+        found = self.resolve(['hours', 'T', 'VCD', 'glucose'])
+        self.assertEqual(found['time'], 'hours')
+        self.assertEqual(found['biomass'], 'VCD')
+        self.assertEqual(found['substrate'], 'glucose')
+
+        found = self.resolve(['timepoint', 'p', 'VCD', 'mAb'])
+        self.assertEqual(found['product'], 'mAb')
+
+    def test_case_insensitive_fallback(self):
+        found = self.resolve(['TIME', 'Biomass', 'GLUCOSE'])
+        self.assertEqual(found, {'time': 'TIME', 'biomass': 'Biomass', 'substrate': 'GLUCOSE'})
+
+    def test_primary_name_wins(self):
+        found = self.resolve(['t', 'time', 'X', 'biomass'])
+        self.assertEqual(found['time'], 'time')
+        self.assertEqual(found['biomass'], 'biomass')
+
+
+if __name__ == '__main__':
+    unittest.main()